@@ -0,0 +1,22 @@
+"""Gunicorn settings for the production container (Cloud Run / Docker)"""
+import os
+
+# === Binding ===
+bind = f"0.0.0.0:{os.environ.get('PORT', '8080')}"
+
+# === Workers ===
+# Background processing jobs, the job table and the response cache live in process memory,
+# so a single worker process serves every request; threads keep the dashboard and job
+# polling responsive while a run is in flight. Gmail/Notion/OpenAI clients use
+# httplib2/httpx/asyncio, which don't mix with gevent monkey-patching - gthread it is.
+workers = int(os.environ.get('GUNICORN_WORKERS', '1'))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', '8'))
+timeout = 120
+graceful_timeout = 30
+keepalive = 5
+
+# === Logging ===
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
@@ -4,22 +4,106 @@
 # 🚀 Flask Main App - Gmail Assistant (Web Dashboard + API)
 # Professional SaaS-style interface with mobile support
 
-from flask import Flask, request, jsonify, render_template_string
+from flask import Flask, Response, request, jsonify, g
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.middleware.proxy_fix import ProxyFix
+from flask_caching import Cache
+from flask_compress import Compress
+import google.auth
 import os
+import functools
+import time
+import threading
+import hashlib
+import re
 import logging
-from datetime import datetime
-import traceback
+from datetime import datetime, timezone
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from uuid import uuid4
 
 # Import our assistant logic
-from assistant import run_assistant
+from assistant import run_assistant, load_environment
+
+try:
+    import orjson
+except ImportError:  # optional accelerator - fall back to Flask's stdlib encoder
+    orjson = None
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Environment is fixed for the life of the process - read the required settings once
+load_environment()
+REQUIRED_ENV_VARS = {
+    'openai_api_key': 'OPENAI_API_KEY',
+    'notion_token': 'NOTION_TOKEN',
+    'notion_db_id': 'NOTION_DB_ID'
+}
+_CONFIG = {key: bool(os.getenv(var)) for key, var in REQUIRED_ENV_VARS.items()}
+MISSING_ENV_VARS = [var for key, var in REQUIRED_ENV_VARS.items() if not _CONFIG[key]]
+
+# Raw exception text can expose internals - only development responses include it
+SHOW_ERROR_DETAILS = os.environ.get('FLASK_ENV') == 'development'
+
 # Initialize Flask app
 app = Flask(__name__)
 
+# Cloud Run / gunicorn sit behind one proxy hop - trust its X-Forwarded-* for client IP, scheme and host
+app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1)
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson's C encoder (datetimes serialize natively)"""
+
+    def dumps(self, obj, **kwargs):
+        # Honour the provider's sort_keys and the indent Flask passes for non-compact output
+        option = orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=kwargs.get('default', self.default), option=option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
+if orjson is not None:
+    app.json = OrjsonProvider(app)
+
+# Compact, unsorted JSON everywhere (Flask pretty-prints in debug mode and sorts keys by default)
+app.json.compact = True
+app.json.sort_keys = False
+
+# Brotli/gzip for the inline-CSS dashboard and the JSON endpoints
+app.config.update(
+    COMPRESS_MIMETYPES=['text/html', 'application/json', 'text/css', 'application/javascript'],
+    COMPRESS_LEVEL=6,
+    COMPRESS_MIN_SIZE=500
+)
+Compress(app)
+
+# In-process response cache - dashboard polls and probes mostly re-request identical output
+cache = Cache(app, config={'CACHE_TYPE': 'SimpleCache'})
+
+
+def utc_now_iso():
+    """Timezone-aware UTC timestamp for JSON payloads"""
+    return datetime.now(timezone.utc).isoformat()
+
+
+@app.before_request
+def stamp_request_time():
+    """Read the clock once per request; every timestamp in the response reuses it"""
+    g.now_iso = utc_now_iso()
+
+
+def is_success_response(rv):
+    """Only plain (200) responses are cached; error tuples like (body, 500) always re-run"""
+    return not isinstance(rv, tuple)
+
 # === HTML DASHBOARD TEMPLATE ===
 HTML_TEMPLATE = '''
 <!DOCTYPE html>
@@ -28,355 +112,7 @@ HTML_TEMPLATE = '''
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>Gmail Assistant Dashboard</title>
-    <style>
-        * {
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-        }
-        
-        body {
-            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, Oxygen, Ubuntu, Cantarell, sans-serif;
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            min-height: 100vh;
-            padding: 1rem;
-            line-height: 1.6;
-        }
-        
-        .container {
-            max-width: 800px;
-            margin: 0 auto;
-            background: white;
-            border-radius: 20px;
-            box-shadow: 0 20px 40px rgba(0,0,0,0.1);
-            overflow: hidden;
-            animation: slideUp 0.6s ease-out;
-        }
-        
-        @keyframes slideUp {
-            from { opacity: 0; transform: translateY(30px); }
-            to { opacity: 1; transform: translateY(0); }
-        }
-        
-        .header {
-            background: linear-gradient(135deg, #4f46e5 0%, #7c3aed 100%);
-            color: white;
-            padding: 2rem;
-            text-align: center;
-            position: relative;
-            overflow: hidden;
-        }
-        
-        .header::before {
-            content: '';
-            position: absolute;
-            top: -50%;
-            left: -50%;
-            width: 200%;
-            height: 200%;
-            background: radial-gradient(circle, rgba(255,255,255,0.1) 1px, transparent 1px);
-            background-size: 30px 30px;
-            animation: float 20s infinite linear;
-        }
-        
-        @keyframes float {
-            0% { transform: translate(0, 0); }
-            100% { transform: translate(30px, 30px); }
-        }
-        
-        .header h1 {
-            font-size: clamp(1.8rem, 4vw, 2.5rem);
-            font-weight: 700;
-            margin-bottom: 0.5rem;
-            position: relative;
-            z-index: 1;
-        }
-        
-        .header p {
-            font-size: clamp(1rem, 2.5vw, 1.2rem);
-            opacity: 0.9;
-            position: relative;
-            z-index: 1;
-        }
-        
-        .content {
-            padding: 2rem;
-        }
-        
-        .status-grid {
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
-            gap: 1.5rem;
-            margin-bottom: 2rem;
-        }
-        
-        .status-card {
-            background: #f8fafc;
-            border: 2px solid #e2e8f0;
-            border-radius: 12px;
-            padding: 1.5rem;
-            text-align: center;
-            transition: all 0.3s ease;
-            position: relative;
-            overflow: hidden;
-        }
-        
-        .status-card:hover {
-            transform: translateY(-2px);
-            box-shadow: 0 8px 25px rgba(0,0,0,0.1);
-            border-color: #4f46e5;
-        }
-        
-        .status-card.ready {
-            border-color: #10b981;
-            background: linear-gradient(135deg, #ecfdf5 0%, #f0fdf4 100%);
-        }
-        
-        .status-card.error {
-            border-color: #ef4444;
-            background: linear-gradient(135deg, #fef2f2 0%, #fef2f2 100%);
-        }
-        
-        .status-icon {
-            font-size: 2rem;
-            margin-bottom: 0.5rem;
-            display: block;
-        }
-        
-        .status-title {
-            font-weight: 600;
-            color: #1e293b;
-            margin-bottom: 0.5rem;
-            font-size: 1.1rem;
-        }
-        
-        .status-value {
-            color: #64748b;
-            font-size: 0.9rem;
-        }
-        
-        .action-section {
-            text-align: center;
-            margin: 2rem 0;
-        }
-        
-        .process-btn {
-            background: linear-gradient(135deg, #4f46e5 0%, #7c3aed 100%);
-            color: white;
-            border: none;
-            padding: 1rem 2rem;
-            border-radius: 50px;
-            font-size: 1.1rem;
-            font-weight: 600;
-            cursor: pointer;
-            transition: all 0.3s ease;
-            box-shadow: 0 4px 15px rgba(79, 70, 229, 0.3);
-            position: relative;
-            overflow: hidden;
-            width: 100%;
-            max-width: 300px;
-        }
-        
-        .process-btn:hover {
-            transform: translateY(-2px);
-            box-shadow: 0 8px 25px rgba(79, 70, 229, 0.4);
-        }
-        
-        .process-btn:active {
-            transform: translateY(0);
-        }
-        
-        .process-btn:disabled {
-            background: #9ca3af;
-            cursor: not-allowed;
-            transform: none;
-            box-shadow: none;
-        }
-        
-        .process-btn::before {
-            content: '';
-            position: absolute;
-            top: 0;
-            left: -100%;
-            width: 100%;
-            height: 100%;
-            background: linear-gradient(90deg, transparent, rgba(255,255,255,0.2), transparent);
-            transition: left 0.5s ease;
-        }
-        
-        .process-btn:hover::before {
-            left: 100%;
-        }
-        
-        .results {
-            margin-top: 2rem;
-            padding: 1.5rem;
-            background: #f8fafc;
-            border-radius: 12px;
-            border-left: 4px solid #4f46e5;
-            display: none;
-        }
-        
-        .results.show {
-            display: block;
-            animation: fadeIn 0.5s ease-out;
-        }
-        
-        @keyframes fadeIn {
-            from { opacity: 0; transform: translateY(10px); }
-            to { opacity: 1; transform: translateY(0); }
-        }
-        
-        .results h3 {
-            color: #1e293b;
-            margin-bottom: 1rem;
-            font-size: 1.2rem;
-        }
-        
-        .results pre {
-            background: #1e293b;
-            color: #e2e8f0;
-            padding: 1rem;
-            border-radius: 8px;
-            overflow-x: auto;
-            font-family: 'Courier New', monospace;
-            font-size: 0.9rem;
-            line-height: 1.5;
-            white-space: pre-wrap;
-            word-wrap: break-word;
-        }
-        
-        .loading {
-            display: none;
-            text-align: center;
-            color: #64748b;
-            margin: 1rem 0;
-        }
-        
-        .loading.show {
-            display: block;
-        }
-        
-        .spinner {
-            display: inline-block;
-            width: 20px;
-            height: 20px;
-            border: 2px solid #e2e8f0;
-            border-radius: 50%;
-            border-top-color: #4f46e5;
-            animation: spin 1s ease-in-out infinite;
-            margin-right: 0.5rem;
-        }
-        
-        @keyframes spin {
-            to { transform: rotate(360deg); }
-        }
-        
-        .footer {
-            background: #f8fafc;
-            padding: 1.5rem;
-            text-align: center;
-            color: #64748b;
-            font-size: 0.9rem;
-        }
-        
-        .api-links {
-            margin-top: 1rem;
-            display: flex;
-            gap: 1rem;
-            justify-content: center;
-            flex-wrap: wrap;
-        }
-        
-        .api-link {
-            color: #4f46e5;
-            text-decoration: none;
-            font-weight: 500;
-            padding: 0.5rem 1rem;
-            border: 1px solid #e2e8f0;
-            border-radius: 8px;
-            transition: all 0.3s ease;
-            font-size: 0.9rem;
-        }
-        
-        .api-link:hover {
-            background: #4f46e5;
-            color: white;
-            transform: translateY(-1px);
-        }
-        
-        /* Mobile Optimizations */
-        @media (max-width: 640px) {
-            body {
-                padding: 0.5rem;
-            }
-            
-            .header {
-                padding: 1.5rem;
-            }
-            
-            .content {
-                padding: 1.5rem;
-            }
-            
-            .status-grid {
-                grid-template-columns: 1fr;
-                gap: 1rem;
-            }
-            
-            .status-card {
-                padding: 1rem;
-            }
-            
-            .process-btn {
-                padding: 0.875rem 1.5rem;
-                font-size: 1rem;
-            }
-            
-            .api-links {
-                flex-direction: column;
-                align-items: center;
-            }
-            
-            .api-link {
-                width: 100%;
-                max-width: 200px;
-                text-align: center;
-            }
-        }
-        
-        /* Dark mode support */
-        @media (prefers-color-scheme: dark) {
-            body {
-                background: linear-gradient(135deg, #1e293b 0%, #334155 100%);
-            }
-            
-            .container {
-                background: #1e293b;
-                color: #e2e8f0;
-            }
-            
-            .status-card {
-                background: #334155;
-                border-color: #475569;
-                color: #e2e8f0;
-            }
-            
-            .status-title {
-                color: #e2e8f0;
-            }
-            
-            .results {
-                background: #334155;
-                color: #e2e8f0;
-            }
-            
-            .footer {
-                background: #334155;
-                color: #94a3b8;
-            }
-        }
-    </style>
+    <link rel="stylesheet" href="{{ url_for('static', filename='dashboard.css', v=asset_version) }}">
 </head>
 <body>
     <div class="container">
@@ -387,19 +123,19 @@ HTML_TEMPLATE = '''
         
         <div class="content">
             <div class="status-grid">
-                <div class="status-card {{ 'ready' if openai_key else 'error' }}">
+                <div id="openai-card" class="status-card {{ 'ready' if openai_key else 'error' }}">
                     <span class="status-icon">{{ '🤖' if openai_key else '❌' }}</span>
                     <div class="status-title">OpenAI API</div>
                     <div class="status-value">{{ 'Connected' if openai_key else 'Missing Key' }}</div>
                 </div>
                 
-                <div class="status-card {{ 'ready' if notion_token else 'error' }}">
+                <div id="notion-card" class="status-card {{ 'ready' if notion_token else 'error' }}">
                     <span class="status-icon">{{ '📝' if notion_token else '❌' }}</span>
                     <div class="status-title">Notion Token</div>
                     <div class="status-value">{{ 'Connected' if notion_token else 'Missing Token' }}</div>
                 </div>
                 
-                <div class="status-card {{ 'ready' if notion_db else 'error' }}">
+                <div id="db-card" class="status-card {{ 'ready' if notion_db else 'error' }}">
                     <span class="status-icon">{{ '🗄️' if notion_db else '❌' }}</span>
                     <div class="status-title">Notion Database</div>
                     <div class="status-value">{{ 'Connected' if notion_db else 'Missing DB ID' }}</div>
@@ -437,234 +173,332 @@ HTML_TEMPLATE = '''
         </div>
     </div>
 
-    <script>
-        document.getElementById('processBtn').addEventListener('click', async function() {
-            const btn = this;
-            const loading = document.getElementById('loading');
-            const results = document.getElementById('results');
-            const resultsContent = document.getElementById('resultsContent');
-            
-            // Show loading state
-            btn.disabled = true;
-            btn.textContent = '⏳ Processing...';
-            loading.classList.add('show');
-            results.classList.remove('show');
-            
-            try {
-                const response = await fetch('/process-emails', {
-                    method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/json'
-                    }
-                });
-                
-                const data = await response.json();
-                
-                // Show results
-                resultsContent.textContent = JSON.stringify(data, null, 2);
-                results.classList.add('show');
-                
-                // Scroll to results
-                results.scrollIntoView({ behavior: 'smooth' });
-                
-            } catch (error) {
-                resultsContent.textContent = `Error: ${error.message}`;
-                results.classList.add('show');
-            } finally {
-                // Reset button state
-                btn.disabled = false;
-                btn.textContent = '🚀 Process Gmail Inbox';
-                loading.classList.remove('show');
-            }
-        });
-        
-        // Auto-refresh status every 30 seconds
-        setInterval(() => {
-            location.reload();
-        }, 30000);
-    </script>
+    <script src="{{ url_for('static', filename='dashboard.js', v=asset_version) }}" defer></script>
 </body>
 </html>
 '''
 
+# Compiled once at import - Jinja lexes and parses the template a single time per process.
+# Source indentation is stripped first (the only <pre> is empty and filled by JS)
+DASHBOARD_TEMPLATE = app.jinja_env.from_string(re.sub(r'\n\s*', '\n', HTML_TEMPLATE).strip())
+
+# Dashboard CSS/JS live in static/ and are cached by browsers for a year; the content hash
+# in their URLs changes whenever either file does, so a deploy never serves stale assets
+STATIC_ASSETS = ('dashboard.css', 'dashboard.js')
+ASSET_VERSION = hashlib.sha256(b''.join(
+    Path(app.static_folder, name).read_bytes() for name in STATIC_ASSETS
+)).hexdigest()[:12]
+
+
+@app.after_request
+def cache_static_assets(response):
+    """Versioned static assets never change under the same URL"""
+    if request.path.startswith(app.static_url_path + '/') and response.status_code == 200:
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
 # === WEB DASHBOARD ROUTE ===
+# The page is a pure function of the template, asset version and configuration snapshot -
+# all fixed per process - so it is rendered once and revalidated by ETag
+DASHBOARD_ETAG = hashlib.blake2b(
+    f"{ASSET_VERSION}-{HTML_TEMPLATE}-{sorted(_CONFIG.items())}".encode(), digest_size=8
+).hexdigest()
+# Flask-Compress rewrites the ETag of compressed responses to "<etag>:<algorithm>", so
+# browsers revalidate with one of those variants rather than the bare tag
+DASHBOARD_ETAGS = (DASHBOARD_ETAG, *(f"{DASHBOARD_ETAG}:{algorithm}" for algorithm in ('gzip', 'deflate', 'br')))
+
+
+@functools.lru_cache(maxsize=1)
+def dashboard_html():
+    """Rendered dashboard page (needs a request context for url_for, so built on first hit)"""
+    return DASHBOARD_TEMPLATE.render(
+        asset_version=ASSET_VERSION,
+        openai_key=_CONFIG['openai_api_key'],
+        notion_token=_CONFIG['notion_token'],
+        notion_db=_CONFIG['notion_db_id']
+    )
 
 @app.route('/')
 def dashboard():
     """Main dashboard - serves the HTML interface"""
-    return render_template_string(HTML_TEMPLATE, 
-        openai_key=bool(os.getenv('OPENAI_API_KEY')),
-        notion_token=bool(os.getenv('NOTION_TOKEN')), 
-        notion_db=bool(os.getenv('NOTION_DB_ID'))
-    )
+    matched_etag = next((etag for etag in DASHBOARD_ETAGS if request.if_none_match.contains(etag)), None)
+    if matched_etag:
+        response = Response(status=304)
+        response.set_etag(matched_etag)
+    else:
+        response = Response(dashboard_html(), mimetype='text/html')
+        response.set_etag(DASHBOARD_ETAG)
+    response.headers['Cache-Control'] = 'public, max-age=10'
+    return response
 
 # === API ROUTES ===
 
-@app.route('/api/info')
-def api_info():
-    """API information endpoint (moved from root)"""
-    return jsonify({
+@functools.lru_cache(maxsize=1)
+def info_payload():
+    """/api/info body - fully static, so serialized once per process"""
+    return app.json.dumps({
         'service': 'Gmail Assistant API',
         'version': '1.0.0',
         'status': 'running',
-        'timestamp': datetime.now().isoformat(),
         'endpoints': {
             '/': 'Dashboard UI (HTML)',
             '/health': 'Health Check',
-            '/process-emails': 'Process Gmail (POST)',
+            '/process-emails': 'Process Gmail (POST, returns a job id)',
+            '/process-emails/<job_id>': 'Processing job status',
             '/api/status': 'Detailed Status',
             '/api/info': 'This endpoint'
         },
         'usage': {
             'dashboard': 'GET /',
-            'process_emails': 'POST /process-emails',
+            'process_emails': 'POST /process-emails, then GET /process-emails/<job_id>',
             'health_check': 'GET /health'
         }
-    })
+    }, separators=(',', ':')).encode()
+
+@app.route('/api/info')
+def api_info():
+    """API information endpoint (moved from root)"""
+    # A fresh Response per request - after_request hooks (compression) modify it in place
+    return Response(info_payload(), mimetype='application/json')
+
+# Application Default Credentials don't change mid-process; a failed lookup (e.g. a metadata
+# server blip) is retried after a short pause instead of being pinned for good
+ADC_RETRY_SECONDS = 30
+_adc_status = {}
+
+
+def application_default_status():
+    """(dwda_status, project_id) from google.auth.default(), resolved once per process"""
+    cached = _adc_status.get('result')
+    if cached and (cached[0] == 'configured' or time.monotonic() - _adc_status['checked_at'] < ADC_RETRY_SECONDS):
+        return cached
+    
+    try:
+        creds, project = google.auth.default()
+        result = ('configured', project if project else 'detected')
+    except Exception as e:
+        result = (f'error: {str(e)}', 'unknown')
+    _adc_status.update(result=result, checked_at=time.monotonic())
+    return result
 
 @app.route('/health')
+@cache.cached(timeout=10, response_filter=is_success_response)
 def health_check():
     """Health check endpoint for monitoring"""
     try:
         # Check required environment variables
-        required_vars = ['OPENAI_API_KEY', 'NOTION_TOKEN', 'NOTION_DB_ID']
-        missing_vars = [var for var in required_vars if not os.getenv(var)]
-        
-        if missing_vars:
+        if MISSING_ENV_VARS:
             return jsonify({
                 'status': 'error',
-                'message': f'Missing environment variables: {", ".join(missing_vars)}',
-                'timestamp': datetime.now().isoformat(),
+                'message': f'Missing environment variables: {", ".join(MISSING_ENV_VARS)}',
+                'timestamp': g.now_iso,
                 'ready': False
             }), 500
         
-        # Try to import Google Auth (basic DWDA check)
-        try:
-            import google.auth
-            creds, project = google.auth.default()
-            dwda_status = 'configured'
-            project_id = project if project else 'detected'
-        except Exception as e:
-            dwda_status = f'error: {str(e)}'
-            project_id = 'unknown'
+        # Basic DWDA check
+        dwda_status, project_id = application_default_status()
         
         return jsonify({
             'status': 'healthy',
             'message': 'Gmail Assistant is ready',
             'dwda_auth': dwda_status,
             'project_id': project_id,
-            'environment_vars': {
-                'openai_api_key': bool(os.getenv('OPENAI_API_KEY')),
-                'notion_token': bool(os.getenv('NOTION_TOKEN')),
-                'notion_db_id': bool(os.getenv('NOTION_DB_ID'))
-            },
-            'timestamp': datetime.now().isoformat(),
+            'environment_vars': _CONFIG,
+            'timestamp': g.now_iso,
             'ready': True
         })
         
     except Exception as e:
-        logger.error(f"Health check failed: {str(e)}")
+        logger.exception("Health check failed")
         return jsonify({
             'status': 'error',
-            'message': str(e),
-            'timestamp': datetime.now().isoformat(),
+            'message': str(e) if SHOW_ERROR_DETAILS else 'Health check failed',
+            'timestamp': g.now_iso,
             'ready': False
         }), 500
 
-@app.route('/process-emails', methods=['POST'])
-def process_emails():
-    """Main endpoint to process Gmail emails"""
+# === Background Processing ===
+# A run is 10-60s of Gmail/OpenAI/Notion I/O - keep it off the request worker and let the
+# dashboard poll for the outcome instead
+# The job table is in-process memory: deployments must run a single instance with CPU
+# allocated outside requests (cloudbuild.yaml: --max-instances=1 --no-cpu-throttling),
+# otherwise jobs stall after their 202 and polls that reach another instance get a 404
+processing_executor = ThreadPoolExecutor(max_workers=2)
+processing_jobs = {}  # job_id -> Future resolving to (payload, http_status)
+processing_jobs_lock = threading.Lock()  # gunicorn serves requests from several threads
+MAX_TRACKED_JOBS = 50
+
+
+def run_processing_job():
+    """Run the assistant and shape the outcome as the endpoint's JSON payload and status code"""
     try:
         logger.info("Starting email processing...")
-        start_time = datetime.now()
+        start_time = datetime.now(timezone.utc)
         
         # Run the assistant
         result = run_assistant()
         
-        end_time = datetime.now()
+        end_time = datetime.now(timezone.utc)
         processing_time = (end_time - start_time).total_seconds()
         
         logger.info(f"Email processing completed successfully in {processing_time:.2f} seconds")
         
-        return jsonify({
+        return {
             'status': 'success',
             'message': 'Email processing completed',
             'result': result,
             'processing_time_seconds': processing_time,
             'timestamp': end_time.isoformat()
-        }), 200
+        }, 200
         
     except ValueError as e:
         # Configuration errors
-        error_msg = f"Configuration Error: {str(e)}"
-        logger.error(error_msg)
-        return jsonify({
+        logger.error(f"Configuration Error: {str(e)}")
+        # These wrap Google/OpenAI exception text too - details stay in the log outside development
+        error_msg = f"Configuration Error: {str(e)}" if SHOW_ERROR_DETAILS else "Configuration Error: see server logs for details"
+        return {
             'status': 'error',
             'error_type': 'configuration',
             'message': error_msg,
-            'timestamp': datetime.now().isoformat()
-        }), 400
+            'timestamp': utc_now_iso()
+        }, 400
         
     except Exception as e:
         # Unexpected errors
-        error_msg = f"Processing Error: {str(e)}"
-        logger.error(f"{error_msg}\n\nTraceback:\n{traceback.format_exc()}")
-        return jsonify({
+        logger.exception("Processing failed")
+        error_msg = f"Processing Error: {str(e)}" if SHOW_ERROR_DETAILS else "Processing Error: see server logs for details"
+        return {
             'status': 'error',
             'error_type': 'processing',
             'message': error_msg,
-            'timestamp': datetime.now().isoformat()
-        }), 500
+            'timestamp': utc_now_iso()
+        }, 500
+
+
+def forget_finished_jobs():
+    """Keep the job table bounded - oldest finished jobs go first (caller holds processing_jobs_lock)"""
+    for job_id in [job_id for job_id, future in processing_jobs.items() if future.done()]:
+        if len(processing_jobs) <= MAX_TRACKED_JOBS:
+            break
+        del processing_jobs[job_id]
+
+
+@app.route('/process-emails', methods=['POST'])
+def process_emails():
+    """Start Gmail processing in the background; returns 202 with a job id to poll"""
+    # One inbox, one run at a time - a second click joins the run already in flight
+    with processing_jobs_lock:
+        running = next((job_id for job_id, future in processing_jobs.items() if not future.done()), None)
+        if running is None:
+            forget_finished_jobs()
+            running = uuid4().hex
+            processing_jobs[running] = processing_executor.submit(run_processing_job)
+        
+    return jsonify({
+        'status': 'accepted',
+        'job_id': running,
+        'status_url': f'/process-emails/{running}',
+        'timestamp': g.now_iso
+    }), 202
+
+@app.route('/process-emails/<job_id>')
+def process_emails_status(job_id):
+    """Outcome of a background processing job"""
+    with processing_jobs_lock:
+        future = processing_jobs.get(job_id)
+    if future is None:
+        return jsonify({
+            'status': 'error',
+            'message': f'Unknown job id: {job_id}',
+            'timestamp': g.now_iso
+        }), 404
+    
+    if not future.done():
+        return jsonify({
+            'status': 'pending',
+            'job_id': job_id,
+            'timestamp': g.now_iso
+        }), 202
+    
+    payload, status_code = future.result()
+    return jsonify({**payload, 'job_id': job_id}), status_code
+
+# Everything in /api/status except the timestamp is fixed for the life of the process
+API_STATUS = {
+    'service': 'Gmail Assistant API',
+    'version': '1.0.0',
+    'status': 'running',
+    'deployment_type': 'web_dashboard_plus_api',
+    'configuration': _CONFIG,
+    'environment': {
+        'port': os.environ.get('PORT', '5000'),
+        'flask_env': os.environ.get('FLASK_ENV', 'production'),
+        'python_version': os.sys.version.split()[0]
+    },
+    'endpoints': {
+        '/': 'Web Dashboard (HTML)',
+        '/health': 'Health Check',
+        '/process-emails': 'Process Gmail (POST only, returns a job id)',
+        '/process-emails/<job_id>': 'Processing job status',
+        '/api/info': 'API Information',
+        '/api/status': 'This endpoint'
+    }
+}
 
 @app.route('/api/status')
+@cache.cached(timeout=60)
 def api_status():
     """Detailed API status endpoint"""
-    return jsonify({
-        'service': 'Gmail Assistant API',
-        'version': '1.0.0',
-        'status': 'running',
-        'deployment_type': 'web_dashboard_plus_api',
-        'timestamp': datetime.now().isoformat(),
-        'environment': {
-            'port': os.environ.get('PORT', '5000'),
-            'flask_env': os.environ.get('FLASK_ENV', 'production'),
-            'python_version': os.sys.version.split()[0]
-        },
-        'endpoints': {
-            '/': 'Web Dashboard (HTML)',
-            '/health': 'Health Check',
-            '/process-emails': 'Process Gmail (POST only)',
-            '/api/info': 'API Information',
-            '/api/status': 'This endpoint'
-        }
-    })
+    return jsonify({**API_STATUS, 'timestamp': g.now_iso})
 
 # === Error Handlers ===
+# Error payloads are constant - serialized once at import, so a burst of scanner 404s
+# costs no dict building or JSON encoding per request
+ERROR_BODIES = {
+    405: app.json.dumps({
+        'error': 'Method not allowed',
+        'message': 'Check the HTTP method. /process-emails requires POST.'
+    }, separators=(',', ':')).encode(),
+    404: app.json.dumps({
+        'error': 'Endpoint not found',
+        'message': 'Please check the URL and try again',
+        'available_endpoints': ['/', '/health', '/process-emails (POST)', '/process-emails/<job_id>', '/api/info', '/api/status']
+    }, separators=(',', ':')).encode(),
+    500: app.json.dumps({
+        'error': 'Internal server error',
+        'message': 'Something went wrong on our end'
+    }, separators=(',', ':')).encode()
+}
+
+
+# Browsers (Accept: text/html) get a small page with a way back instead of raw JSON
+ERROR_PAGES = {
+    status_code: (
+        '<!DOCTYPE html><html lang="en"><head><meta charset="UTF-8">'
+        f'<title>{status_code} {title}</title></head>'
+        f'<body><h1>{status_code} {title}</h1><p><a href="/">Back to the Gmail Assistant dashboard</a></p></body></html>'
+    ).encode()
+    for status_code, title in ((404, 'Not Found'), (405, 'Method Not Allowed'), (500, 'Internal Server Error'))
+}
+
+
+def error_response(status_code):
+    """Prebuilt error body for the status code - HTML for browsers, JSON for everything else"""
+    if request.accept_mimetypes.best_match(['application/json', 'text/html']) == 'text/html':
+        return Response(ERROR_PAGES[status_code], status=status_code, mimetype='text/html')
+    return Response(ERROR_BODIES[status_code], status=status_code, mimetype='application/json')
 
 @app.errorhandler(405)
 def method_not_allowed(error):
-    return jsonify({
-        'error': 'Method not allowed',
-        'message': 'Check the HTTP method. /process-emails requires POST.',
-        'timestamp': datetime.now().isoformat()
-    }), 405
+    return error_response(405)
 
 @app.errorhandler(404)
 def not_found(error):
-    return jsonify({
-        'error': 'Endpoint not found',
-        'message': 'Please check the URL and try again',
-        'available_endpoints': ['/', '/health', '/process-emails (POST)', '/api/info', '/api/status'],
-        'timestamp': datetime.now().isoformat()
-    }), 404
+    return error_response(404)
 
 @app.errorhandler(500)
 def internal_error(error):
-    return jsonify({
-        'error': 'Internal server error',
-        'message': 'Something went wrong on our end',
-        'timestamp': datetime.now().isoformat()
-    }), 500
+    return error_response(500)
 
 # === Main Application Entry Point ===
 
@@ -677,16 +511,13 @@ if __name__ == '__main__':
     print("📧 Process Emails: POST http://localhost:5000/process-emails")
     
     # Check environment on startup
-    required_vars = ['OPENAI_API_KEY', 'NOTION_TOKEN', 'NOTION_DB_ID']
-    missing_vars = [var for var in required_vars if not os.getenv(var)]
-    
-    if missing_vars:
-        print(f"⚠️ WARNING: Missing environment variables: {', '.join(missing_vars)}")
+    if MISSING_ENV_VARS:
+        print(f"⚠️ WARNING: Missing environment variables: {', '.join(MISSING_ENV_VARS)}")
         print("💡 Dashboard will show configuration issues!")
     else:
         print("✅ All environment variables configured!")
     
-    # Run Flask app
+    # Run Flask's development server - production runs gunicorn (see gunicorn.conf.py)
     app.run(
         host='0.0.0.0',  # Accept connections from any IP
         port=int(os.environ.get('PORT', 5000)),  # Use PORT env var for cloud deployment
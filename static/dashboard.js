@@ -0,0 +1,77 @@
+document.getElementById('processBtn').addEventListener('click', async function() {
+    const btn = this;
+    const loading = document.getElementById('loading');
+    const results = document.getElementById('results');
+    const resultsContent = document.getElementById('resultsContent');
+
+    // Show loading state
+    btn.disabled = true;
+    btn.textContent = '⏳ Processing...';
+    loading.classList.add('show');
+    results.classList.remove('show');
+
+    try {
+        const response = await fetch('/process-emails', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            }
+        });
+        const job = await response.json();
+
+        // Processing runs in the background - poll until the job finishes
+        let data = job;
+        while (data.status === 'accepted' || data.status === 'pending') {
+            await new Promise(resolve => setTimeout(resolve, 2000));
+            data = await (await fetch(job.status_url)).json();
+        }
+
+        // Show results
+        resultsContent.textContent = JSON.stringify(data, null, 2);
+        results.classList.add('show');
+
+        // Scroll to results
+        results.scrollIntoView({ behavior: 'smooth' });
+
+    } catch (error) {
+        resultsContent.textContent = `Error: ${error.message}`;
+        results.classList.add('show');
+    } finally {
+        // Reset button state
+        btn.disabled = false;
+        btn.textContent = '🚀 Process Gmail Inbox';
+        loading.classList.remove('show');
+    }
+});
+
+// Auto-refresh status every 30 seconds - only the cards, not the whole page
+const STATUS_CARDS = [
+    ['openai-card', 'openai_api_key', '🤖', 'Missing Key'],
+    ['notion-card', 'notion_token', '📝', 'Missing Token'],
+    ['db-card', 'notion_db_id', '🗄️', 'Missing DB ID']
+];
+
+setInterval(async () => {
+    try {
+        const response = await fetch('/api/status');
+        const configuration = (await response.json()).configuration;
+        let allReady = true;
+
+        STATUS_CARDS.forEach(([cardId, key, readyIcon, missingText]) => {
+            const ready = Boolean(configuration[key]);
+            const card = document.getElementById(cardId);
+            allReady = allReady && ready;
+            card.classList.toggle('ready', ready);
+            card.classList.toggle('error', !ready);
+            card.querySelector('.status-icon').textContent = ready ? readyIcon : '❌';
+            card.querySelector('.status-value').textContent = ready ? 'Connected' : missingText;
+        });
+
+        // Leave the button alone while a run is in progress
+        if (!document.getElementById('loading').classList.contains('show')) {
+            document.getElementById('processBtn').disabled = !allReady;
+        }
+    } catch (error) {
+        // Keep the last known status until the next poll
+    }
+}, 30000);
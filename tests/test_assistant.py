@@ -0,0 +1,163 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import assistant
+
+
+class AnalysisFingerprintTest(unittest.TestCase):
+    def test_amounts_and_dates_change_the_key(self):
+        first = assistant.analysis_fingerprint("Invoice", "Invoice 500 due 3 Oct", "English")
+        second = assistant.analysis_fingerprint("Invoice", "Invoice 50000 due 12 Nov", "English")
+        self.assertNotEqual(first, second)
+
+    def test_links_addresses_and_long_ids_are_masked(self):
+        first = assistant.analysis_fingerprint(
+            "Build finished", "Run 12345678 for ops@example.com: https://ci.example.com/run/1", "English"
+        )
+        second = assistant.analysis_fingerprint(
+            "Build finished", "Run 87654321 for dev@example.org: https://ci.example.com/run/2", "English"
+        )
+        self.assertEqual(first, second)
+
+    def test_whitespace_and_case_are_normalized(self):
+        first = assistant.analysis_fingerprint("Weekly Update", "Numbers  look\ngood", "English")
+        second = assistant.analysis_fingerprint("weekly update", "numbers look good", "English")
+        self.assertEqual(first, second)
+
+    def test_language_is_part_of_the_key(self):
+        self.assertNotEqual(
+            assistant.analysis_fingerprint("Hello", "Same body", "English"),
+            assistant.analysis_fingerprint("Hello", "Same body", "French")
+        )
+
+
+class ReusableAnalysisTest(unittest.TestCase):
+    ANALYSIS = {
+        "summary": "Partner wants a call next week.",
+        "commands": ["executive_meeting"],
+        "tone": "positive",
+        "reply_strategic": "Happy to meet.",
+        "reply_relationship": "Great to hear from you."
+    }
+
+    def test_successful_analysis_is_reusable(self):
+        self.assertTrue(assistant.is_reusable_analysis(self.ANALYSIS))
+
+    def test_service_errors_and_fallbacks_are_not_reusable(self):
+        failed_draft = {**self.ANALYSIS, "reply_strategic": "[AI Service Unavailable: timeout]"}
+        fallback = {**self.ANALYSIS, "summary": "Strategic email analysis unavailable - manual review recommended."}
+        self.assertFalse(assistant.is_reusable_analysis(failed_draft))
+        self.assertFalse(assistant.is_reusable_analysis(fallback))
+
+    def test_store_skips_unreusable_and_returns_copies(self):
+        assistant.store_analysis("fallback-key", {**self.ANALYSIS, "reply_strategic": "[AI Service Unavailable]"})
+        self.assertIsNone(assistant.get_cached_analysis("fallback-key"))
+
+        assistant.store_analysis("good-key", self.ANALYSIS)
+        cached = assistant.get_cached_analysis("good-key")
+        self.assertEqual(cached, self.ANALYSIS)
+        cached["summary"] = "changed"
+        self.assertEqual(assistant.get_cached_analysis("good-key")["summary"], self.ANALYSIS["summary"])
+
+
+class AutomatedMessageFilterTest(unittest.TestCase):
+    def test_person_to_person_mail_passes(self):
+        headers = {"From": "Jane Doe <jane@partner.com>", "Subject": "Partnership proposal"}
+        self.assertFalse(assistant.is_automated_message(headers))
+
+    def test_bulk_headers_are_filtered(self):
+        base = {"From": "Jane Doe <jane@partner.com>", "Subject": "Hello"}
+        for extra in (
+            {"List-Unsubscribe": "<mailto:unsubscribe@partner.com>"},
+            {"Auto-Submitted": "auto-generated"},
+            {"Precedence": "Bulk"}
+        ):
+            with self.subTest(extra=extra):
+                self.assertTrue(assistant.is_automated_message({**base, **extra}))
+
+    def test_auto_submitted_no_passes(self):
+        headers = {"From": "jane@partner.com", "Subject": "Hello", "Auto-Submitted": "No"}
+        self.assertFalse(assistant.is_automated_message(headers))
+
+    def test_system_senders_subjects_and_domains_are_filtered(self):
+        for headers in (
+            {"From": "No-Reply <no-reply@shop.com>", "Subject": "Hello"},
+            {"From": "billing@shop.com", "Subject": "Your receipt from Shop"},
+            {"From": "GitHub <octo@github.com>", "Subject": "New comment"}
+        ):
+            with self.subTest(headers=headers):
+                self.assertTrue(assistant.is_automated_message(headers))
+
+    def test_platform_name_in_display_name_only_passes(self):
+        headers = {"From": "Sam from github.com <sam@partner.com>", "Subject": "Intro"}
+        self.assertFalse(assistant.is_automated_message(headers))
+
+    def test_read_headers_keeps_only_filter_headers(self):
+        payload = {"headers": [
+            {"name": "Subject", "value": "Hi"},
+            {"name": "Received", "value": "from mx"},
+            {"name": "List-Unsubscribe", "value": "<mailto:x@y.com>"}
+        ]}
+        self.assertEqual(
+            assistant.read_headers(payload),
+            {"Subject": "Hi", "List-Unsubscribe": "<mailto:x@y.com>"}
+        )
+
+
+class BulkBodyFilterTest(unittest.TestCase):
+    def test_single_footer_marker_is_not_bulk(self):
+        body = "Thanks for the call. If you'd rather not get these updates, just say unsubscribe."
+        self.assertFalse(assistant.looks_like_bulk_body(body))
+
+    def test_repeated_marker_counts_once(self):
+        self.assertFalse(assistant.looks_like_bulk_body("Unsubscribe here. unsubscribe there. UNSUBSCRIBE."))
+
+    def test_two_distinct_markers_are_bulk(self):
+        body = "Big sale this week! View this email in your browser. Click here to unsubscribe."
+        self.assertTrue(assistant.looks_like_bulk_body(body))
+
+
+class LanguageDetectionTest(unittest.TestCase):
+    def test_short_text_uses_the_default(self):
+        self.assertEqual(assistant.detect_language_premium("Re: ok"), assistant.DEFAULT_LANGUAGE)
+
+    def test_codes_map_to_names(self):
+        text = "Bonjour, je voudrais discuter de notre partenariat stratégique cette semaine."
+        self.assertEqual(assistant.detect_language_premium(text), "French")
+
+
+class StateDatabaseTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patcher = mock.patch.dict(os.environ, {"ASSISTANT_STATE_DB": os.path.join(directory.name, "state.db")})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_seen_ids_round_trip(self):
+        self.assertEqual(assistant.load_seen_message_ids(["a", "b"]), set())
+        assistant.mark_messages_seen(["a"])
+        self.assertEqual(assistant.load_seen_message_ids(["a", "b"]), {"a"})
+
+    def test_checkpoints_resume_until_marked_seen(self):
+        analysis = dict(ReusableAnalysisTest.ANALYSIS)
+        failed = {**analysis, "reply_strategic": "[AI Service Unavailable]"}
+        assistant.checkpoint_analyses({"a": analysis, "b": failed})
+        self.assertEqual(assistant.load_checkpointed_analyses(["a", "b"]), {"a": analysis})
+
+        assistant.mark_messages_seen(["a"])
+        self.assertEqual(assistant.load_checkpointed_analyses(["a"]), {})
+
+    def test_response_cache_round_trip(self):
+        self.assertIsNone(assistant.load_cached_response("key"))
+        assistant.save_cached_response("key", "answer")
+        self.assertEqual(assistant.load_cached_response("key"), "answer")
+
+
+if __name__ == '__main__':
+    unittest.main()
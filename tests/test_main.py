@@ -0,0 +1,33 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import app
+
+
+class DashboardRevalidationTest(unittest.TestCase):
+    def setUp(self):
+        self.client = app.test_client()
+
+    def test_compressed_etag_revalidates_to_304(self):
+        first = self.client.get('/', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.headers['Content-Encoding'], 'gzip')
+        etag = first.headers['ETag']
+        self.assertTrue(etag.endswith(':gzip"'))
+
+        second = self.client.get('/', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.headers['ETag'], etag)
+        self.assertEqual(second.data, b'')
+
+    def test_uncompressed_etag_revalidates_to_304(self):
+        etag = self.client.get('/', headers={'Accept-Encoding': 'identity'}).headers['ETag']
+        response = self.client.get('/', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+
+if __name__ == '__main__':
+    unittest.main()